@@ -2,17 +2,99 @@
 Data processing and activity classification logic
 """
 
-from collections import deque
-from datetime import datetime
-from typing import Optional, List
-from models import SensorReading, ProcessedReading, ActivityState, CurrentStatus, SessionStats
+from datetime import datetime, timedelta
+import math
+from typing import Optional, List, Tuple
+import numpy as np
+from models import (
+    SensorReading, ClassifiedReading, ActivityState, CurrentStatus, SessionStats,
+    ACTIVITY_STATE_CODES
+)
+from utils import to_utc, utcnow
 from config import (
     DELTA_MAG_ACTIVE_THRESHOLD,
     DELTA_MAG_TRANSITION_THRESHOLD,
     MOVING_AVERAGE_WINDOW,
-    SEDENTARY_THRESHOLD_SECONDS
+    SEDENTARY_THRESHOLD_SECONDS,
+    ALERT_DEBOUNCE_SECONDS
 )
 
+_ALERT_DEBOUNCE = timedelta(seconds=ALERT_DEBOUNCE_SECONDS)
+
+# (state, confidence) indexed by pir_motion * 3 + movement bucket,
+# where bucket is 0 = low, 1 = medium, 2 = high accelerometer change
+_CLASSIFICATION_TABLE = (
+    # No PIR motion
+    (ActivityState.INACTIVE, 0.9),    # Both sensors agree - inactive
+    (ActivityState.TRANSITION, 0.6),  # Minor movement, could be transition
+    (ActivityState.ACTIVE, 0.8),      # Only accelerometer - medium-high confidence
+    # PIR motion
+    (ActivityState.ACTIVE, 0.6),      # Large slow movement the accelerometer misses
+    (ActivityState.ACTIVE, 0.7),      # PIR confirms some movement
+    (ActivityState.ACTIVE, 1.0),      # Both sensors agree - high confidence active
+)
+
+# The same table split into arrays for vectorized classification
+_STATE_CODE_ARRAY = np.array(
+    [ACTIVITY_STATE_CODES[state] for state, _ in _CLASSIFICATION_TABLE], dtype=np.int8
+)
+_CONFIDENCE_ARRAY = np.array(
+    [confidence for _, confidence in _CLASSIFICATION_TABLE], dtype=np.float64
+)
+
+
+def classify_batch(pir: np.ndarray, delta_mag_smoothed: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Classify many readings at once, e.g. when reprocessing stored data.
+    Uses the same rules as DataProcessor.classify_activity.
+    
+    Returns:
+        tuple: (activity state codes as in ACTIVITY_STATE_CODES, confidence scores)
+    """
+    pir = np.asarray(pir)
+    delta_mag_smoothed = np.asarray(delta_mag_smoothed)
+    
+    bucket = (
+        (delta_mag_smoothed >= DELTA_MAG_TRANSITION_THRESHOLD).astype(np.int8)
+        + (delta_mag_smoothed >= DELTA_MAG_ACTIVE_THRESHOLD).astype(np.int8)
+    )
+    index = (pir == 1).astype(np.int8) * 3 + bucket
+    
+    return _STATE_CODE_ARRAY[index], _CONFIDENCE_ARRAY[index]
+
+
+def sma_batch(delta_mag: np.ndarray, window: int = MOVING_AVERAGE_WINDOW) -> np.ndarray:
+    """
+    Moving average over a whole series, e.g. when reprocessing stored data.
+    Matches DataProcessor.apply_moving_average: the first window-1 values
+    are averaged over the readings seen so far.
+    Uses a cumulative sum, so the cost is O(N) regardless of window size.
+    """
+    if window < 1:
+        raise ValueError(f"window must be at least 1, got {window}")
+    
+    delta_mag = np.asarray(delta_mag, dtype=np.float64)
+    
+    # A nan/inf in the cumulative sum would spill into every later window,
+    # so sum only finite values here and patch the affected windows below
+    finite = np.isfinite(delta_mag)
+    cumulative = np.cumsum(np.where(finite, delta_mag, 0.0))
+    smoothed = np.empty_like(cumulative)
+    
+    # Warm-up: average of all readings so far
+    warm_up = min(window, len(delta_mag))
+    smoothed[:warm_up] = cumulative[:warm_up] / np.arange(1, warm_up + 1)
+    
+    # Full windows: difference of cumulative sums
+    smoothed[window:] = (cumulative[window:] - cumulative[:-window]) / window
+    
+    # Windows that hold a nan/inf are nan/inf, exactly as in apply_moving_average
+    for bad in np.flatnonzero(~finite):
+        for i in range(bad, min(bad + window, len(delta_mag))):
+            smoothed[i] = delta_mag[max(0, i - window + 1):i + 1].mean()
+    
+    return smoothed
+
 
 class DataProcessor:
     """
@@ -21,14 +103,20 @@ class DataProcessor:
     """
 
     def __init__(self):
-        # Buffer for moving average smoothing
-        self.delta_mag_buffer: deque = deque(maxlen=MOVING_AVERAGE_WINDOW)
+        # Ring buffer with a running sum for O(1) moving average smoothing
+        self._buf: List[float] = [0.0] * MOVING_AVERAGE_WINDOW
+        self._idx: int = 0
+        self._count: int = 0
+        self._sum: float = 0.0
         
         # Track current status
         self.last_movement_time: Optional[datetime] = None
         self.current_inactive_seconds: int = 0
         self.is_alerted: bool = False
         
+        # Timestamp of the last alert event, used to de-duplicate alerts
+        self.last_alert_time: Optional[datetime] = None
+        
         # Statistics tracking
         self.total_readings: int = 0
         self.total_active_readings: int = 0
@@ -36,18 +124,36 @@ class DataProcessor:
         self.alert_count: int = 0
         self.longest_inactive_period: int = 0
         self.current_inactive_streak: int = 0
+        
+        # Last SessionStats built, reused until the counters change
+        self._cached_stats: Optional[SessionStats] = None
+        self._stats_dirty: bool = True
 
     def apply_moving_average(self, delta_mag: float) -> float:
         """
         Apply moving average smoothing to delta magnitude.
         This reduces noise from sensor readings.
+        The running sum is updated incrementally, so each call is O(1).
         """
-        self.delta_mag_buffer.append(delta_mag)
+        evicted = self._buf[self._idx] if self._count == MOVING_AVERAGE_WINDOW else 0.0
+        self._sum += delta_mag - evicted
+        self._buf[self._idx] = delta_mag
+        self._idx = (self._idx + 1) % MOVING_AVERAGE_WINDOW
+        self._count = min(self._count + 1, MOVING_AVERAGE_WINDOW)
         
-        if len(self.delta_mag_buffer) == 0:
-            return delta_mag
+        # A nan/inf reading poisons the running sum even after it is evicted -
+        # recompute from the window until the sum is finite again
+        if not math.isfinite(self._sum):
+            self._sum = sum(self._buf)
         
-        return sum(self.delta_mag_buffer) / len(self.delta_mag_buffer)
+        return self._sum / self._count
+
+    @property
+    def current_average(self) -> Optional[float]:
+        """Current smoothed delta magnitude, or None if no readings yet"""
+        if self._count == 0:
+            return None
+        return self._sum / self._count
 
     def classify_activity(self, pir: int, delta_mag_smoothed: float) -> tuple[ActivityState, float]:
         """
@@ -66,37 +172,13 @@ class DataProcessor:
         - Medium (0.6-0.8): Only one sensor indicates movement
         - Low (0.4-0.5): Borderline readings
         """
-        pir_motion = pir == 1
-        
-        # High movement detected
-        if delta_mag_smoothed >= DELTA_MAG_ACTIVE_THRESHOLD:
-            if pir_motion:
-                # Both sensors agree - high confidence active
-                return ActivityState.ACTIVE, 1.0
-            else:
-                # Only accelerometer - medium-high confidence
-                return ActivityState.ACTIVE, 0.8
-        
-        # Medium movement
-        elif delta_mag_smoothed >= DELTA_MAG_TRANSITION_THRESHOLD:
-            if pir_motion:
-                # PIR confirms some movement
-                return ActivityState.ACTIVE, 0.7
-            else:
-                # Minor movement, could be transition
-                return ActivityState.TRANSITION, 0.6
-        
-        # Low movement from accelerometer
-        else:
-            if pir_motion:
-                # PIR detects motion but accelerometer doesn't
-                # Could be large slow movement
-                return ActivityState.ACTIVE, 0.6
-            else:
-                # Both sensors agree - inactive
-                return ActivityState.INACTIVE, 0.9
+        bucket = (
+            (delta_mag_smoothed >= DELTA_MAG_TRANSITION_THRESHOLD)
+            + (delta_mag_smoothed >= DELTA_MAG_ACTIVE_THRESHOLD)
+        )
+        return _CLASSIFICATION_TABLE[(pir == 1) * 3 + bucket]
 
-    def process_reading(self, reading: SensorReading) -> ProcessedReading:
+    def process_reading(self, reading: SensorReading) -> ClassifiedReading:
         """
         Process a raw sensor reading and return classified result.
         """
@@ -130,9 +212,17 @@ class DataProcessor:
             self.alert_count += 1
             self.is_alerted = True
         
+        # A new alert event starts if none was recorded within the debounce window
+        is_new_alert = False
+        if reading.alerted == 1:
+            if self.last_alert_time is None or reading.timestamp - self.last_alert_time > _ALERT_DEBOUNCE:
+                is_new_alert = True
+                self.last_alert_time = reading.timestamp
+        
         self.current_inactive_seconds = reading.inactive_seconds
+        self._stats_dirty = True
         
-        return ProcessedReading(
+        return ClassifiedReading(
             timestamp=reading.timestamp,
             pir=reading.pir,
             delta_mag=reading.delta_mag,
@@ -140,7 +230,8 @@ class DataProcessor:
             inactive_seconds=reading.inactive_seconds,
             alerted=reading.alerted,
             activity_state=activity_state,
-            confidence=confidence
+            confidence=confidence,
+            is_new_alert=is_new_alert
         )
 
     def get_current_status(self) -> CurrentStatus:
@@ -148,8 +239,8 @@ class DataProcessor:
         # Determine current activity state based on recent data
         if self.current_inactive_seconds >= SEDENTARY_THRESHOLD_SECONDS:
             activity_state = ActivityState.INACTIVE
-        elif len(self.delta_mag_buffer) > 0:
-            avg_delta = sum(self.delta_mag_buffer) / len(self.delta_mag_buffer)
+        elif self.current_average is not None:
+            avg_delta = self.current_average
             if avg_delta >= DELTA_MAG_ACTIVE_THRESHOLD:
                 activity_state = ActivityState.ACTIVE
             elif avg_delta >= DELTA_MAG_TRANSITION_THRESHOLD:
@@ -163,14 +254,23 @@ class DataProcessor:
             activity_state=activity_state,
             inactive_seconds=self.current_inactive_seconds,
             is_alerted=self.is_alerted,
-            last_movement=self.last_movement_time or datetime.now(),
+            last_movement=to_utc(self.last_movement_time) if self.last_movement_time else utcnow(),
             confidence=0.9 if self.total_readings > MOVING_AVERAGE_WINDOW else 0.5
         )
 
     def get_session_stats(self) -> SessionStats:
-        """Get statistics for the current session"""
+        """
+        Get statistics for the current session.
+        The result is cached until the next reading or reset.
+        """
+        if not self._stats_dirty and self._cached_stats is not None:
+            return self._cached_stats
+        
+        # Clear first, so a reading processed while building marks it dirty again
+        self._stats_dirty = False
+        
         if self.total_readings == 0:
-            return SessionStats(
+            stats = SessionStats(
                 total_readings=0,
                 total_active_time_seconds=0,
                 total_inactive_time_seconds=0,
@@ -178,21 +278,27 @@ class DataProcessor:
                 alert_count=0,
                 active_percentage=0.0
             )
+        else:
+            active_percentage = (self.total_active_readings / self.total_readings) * 100
+            
+            stats = SessionStats(
+                total_readings=self.total_readings,
+                total_active_time_seconds=self.total_active_readings,  # 1 reading per second
+                total_inactive_time_seconds=self.total_inactive_readings,
+                longest_inactive_period_seconds=self.longest_inactive_period,
+                alert_count=self.alert_count,
+                active_percentage=round(active_percentage, 2)
+            )
         
-        active_percentage = (self.total_active_readings / self.total_readings) * 100
-        
-        return SessionStats(
-            total_readings=self.total_readings,
-            total_active_time_seconds=self.total_active_readings,  # 1 reading per second
-            total_inactive_time_seconds=self.total_inactive_readings,
-            longest_inactive_period_seconds=self.longest_inactive_period,
-            alert_count=self.alert_count,
-            active_percentage=round(active_percentage, 2)
-        )
+        self._cached_stats = stats
+        return stats
 
     def reset_stats(self):
         """Reset all statistics (for new session)"""
-        self.delta_mag_buffer.clear()
+        self._buf = [0.0] * MOVING_AVERAGE_WINDOW
+        self._idx = 0
+        self._count = 0
+        self._sum = 0.0
         self.last_movement_time = None
         self.current_inactive_seconds = 0
         self.is_alerted = False
@@ -202,3 +308,4 @@ class DataProcessor:
         self.alert_count = 0
         self.longest_inactive_period = 0
         self.current_inactive_streak = 0
+        self._stats_dirty = True
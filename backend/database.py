@@ -1,35 +1,95 @@
 """
-Database setup and models for SQLite storage
+Database setup and models for PostgreSQL (or SQLite) storage
 """
 
-from sqlalchemy import create_engine, Column, Integer, Float, String, DateTime, Boolean
-from sqlalchemy.orm import sessionmaker, declarative_base
-from datetime import datetime
+from sqlalchemy import create_engine, event, make_url, insert, text, Column, Integer, SmallInteger, REAL, DateTime, Index
+from sqlalchemy.orm import sessionmaker, scoped_session, declarative_base
+from sqlalchemy.types import TypeDecorator
+from datetime import datetime, timezone
+
+from config import DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE_SECONDS
+from models import ACTIVITY_STATE_CODES
+from utils import BERLIN_TZ, to_utc, utcnow
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Use WAL journaling so commits don't fsync the whole database file"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
 
-from config import DATABASE_URL
 
 # Create engine and session
-# Note: PostgreSQL doesn't need check_same_thread (that's SQLite-specific)
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+if make_url(DATABASE_URL).get_backend_name() == "sqlite":
+    # check_same_thread is SQLite-specific - sessions are used from several threads
+    engine = create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        pool_size=1
+    )
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+else:
+    engine = create_engine(
+        DATABASE_URL,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_recycle=DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=False
+    )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Thread-local session for long-running background writers
+ScopedSession = scoped_session(SessionLocal)
+
 Base = declarative_base()
 
 
+class UTCDateTime(TypeDecorator):
+    """
+    Timezone-aware UTC datetime column.
+    PostgreSQL stores it as TIMESTAMPTZ. SQLite has no timezone support,
+    so values are stored as naive UTC and marked as UTC again on load.
+    """
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or value.tzinfo is None:
+            return value
+        value = value.astimezone(timezone.utc)
+        if dialect.name == "sqlite":
+            return value.replace(tzinfo=None)
+        return value
+
+    def process_result_value(self, value, dialect):
+        if value is not None and value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value
+
+
 class SensorReadingDB(Base):
     """Database model for sensor readings"""
     __tablename__ = "sensor_readings"
+    __table_args__ = (
+        # Covers timestamp range scans for the timeline and daily summary.
+        # On PostgreSQL the INCLUDE columns allow index-only scans.
+        Index(
+            "ix_reading_ts_state", "timestamp", "activity_state",
+            postgresql_include=["inactive_seconds", "delta_mag"]
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    timestamp = Column(DateTime, index=True)
+    timestamp = Column(UTCDateTime)
     pir = Column(Integer)  # 0 or 1
-    delta_mag = Column(Float)
-    delta_mag_smoothed = Column(Float)
+    delta_mag = Column(REAL)  # 4-byte float is plenty for 3-decimal sensor values
+    delta_mag_smoothed = Column(REAL)
     inactive_seconds = Column(Integer)
     alerted = Column(Integer)  # 0 or 1
-    activity_state = Column(String)  # 'active', 'inactive', 'transition'
-    confidence = Column(Float)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    activity_state = Column(SmallInteger)  # See models.ACTIVITY_STATE_CODES
+    confidence = Column(REAL)
+    created_at = Column(UTCDateTime, default=utcnow)
 
 
 class AlertEventDB(Base):
@@ -37,14 +97,110 @@ class AlertEventDB(Base):
     __tablename__ = "alert_events"
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    timestamp = Column(DateTime, index=True)
+    timestamp = Column(UTCDateTime, index=True)
     duration_seconds = Column(Integer)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(UTCDateTime, default=utcnow)
+
+
+def _migrate_postgresql(conn):
+    """Convert old-schema columns in place with ALTER COLUMN ... USING"""
+    state_cases = " ".join(
+        f"WHEN '{state.value}' THEN {code}" for state, code in ACTIVITY_STATE_CODES.items()
+    )
+    
+    for table in ("sensor_readings", "alert_events"):
+        column_types = dict(conn.execute(
+            text("SELECT column_name, data_type FROM information_schema.columns WHERE table_name = :table"),
+            {"table": table}
+        ).all())
+        changes = []
+        
+        # Arduino timestamps were stored as naive Berlin local time, created_at as naive UTC
+        if column_types["timestamp"] == "timestamp without time zone":
+            changes.append(
+                f"ALTER COLUMN \"timestamp\" TYPE TIMESTAMPTZ USING \"timestamp\" AT TIME ZONE '{BERLIN_TZ.key}'"
+            )
+        if column_types["created_at"] == "timestamp without time zone":
+            changes.append("ALTER COLUMN created_at TYPE TIMESTAMPTZ USING created_at AT TIME ZONE 'UTC'")
+        
+        if table == "sensor_readings":
+            if column_types["activity_state"] != "smallint":
+                changes.append(
+                    f"ALTER COLUMN activity_state TYPE SMALLINT USING CASE activity_state {state_cases} END"
+                )
+            for column in ("delta_mag", "delta_mag_smoothed", "confidence"):
+                if column_types[column] == "double precision":
+                    changes.append(f"ALTER COLUMN {column} TYPE REAL")
+        
+        if changes:
+            # One ALTER TABLE so the table is rewritten only once
+            conn.execute(text(f"ALTER TABLE {table} " + ", ".join(changes)))
+            print(f"Migrated {table}: {len(changes)} column(s) converted")
+
+
+def _migrate_sqlite(conn):
+    """
+    Rebuild old-schema tables. SQLite can't change column types and has no
+    time zone support, so rows are converted in Python and copied over.
+    """
+    column_types = {row[1]: row[2] for row in conn.exec_driver_sql("PRAGMA table_info(sensor_readings)")}
+    if column_types["activity_state"] == "SMALLINT":
+        return
+    
+    state_codes = {state.value: code for state, code in ACTIVITY_STATE_CODES.items()}
+    
+    for model in (SensorReadingDB, AlertEventDB):
+        table = model.__table__
+        
+        # Old index names clash with the ones created for the new table
+        for (index_name,) in conn.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (table.name,)
+        ).all():
+            conn.exec_driver_sql(f"DROP INDEX {index_name}")
+        conn.exec_driver_sql(f"ALTER TABLE {table.name} RENAME TO {table.name}_old")
+        table.create(conn)
+        
+        rows = [dict(row) for row in conn.exec_driver_sql(f"SELECT * FROM {table.name}_old").mappings()]
+        for row in rows:
+            # Arduino timestamps were stored as naive Berlin local time, created_at as naive UTC
+            if row["timestamp"] is not None:
+                row["timestamp"] = to_utc(datetime.fromisoformat(row["timestamp"]))
+            if row["created_at"] is not None:
+                row["created_at"] = datetime.fromisoformat(row["created_at"]).replace(tzinfo=timezone.utc)
+            if "activity_state" in row:
+                row["activity_state"] = state_codes.get(row["activity_state"])
+        if rows:
+            conn.execute(insert(table), rows)
+        
+        conn.exec_driver_sql(f"DROP TABLE {table.name}_old")
+        print(f"Migrated {table.name}: {len(rows)} row(s) copied")
+
+
+def migrate_db():
+    """
+    Bring tables created by older versions up to the current schema:
+    activity_state as a SMALLINT code, timezone-aware UTC timestamps,
+    REAL floats and the ix_reading_ts_state index.
+    Safe to run repeatedly - already migrated columns are left alone.
+    """
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            _migrate_postgresql(conn)
+            # Superseded by ix_reading_ts_state
+            conn.execute(text("DROP INDEX IF EXISTS ix_sensor_readings_timestamp"))
+        elif conn.dialect.name == "sqlite":
+            _migrate_sqlite(conn)
+        
+        # create_all skips indexes of tables that already exist
+        for index in SensorReadingDB.__table__.indexes:
+            index.create(conn, checkfirst=True)
 
 
 def init_db():
-    """Initialize the database - create all tables"""
+    """Initialize the database - create missing tables and migrate existing ones"""
     Base.metadata.create_all(bind=engine)
+    migrate_db()
     print("Database initialized successfully!")
 
 
@@ -5,21 +5,29 @@ Main application with REST API endpoints
 
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, case, insert, select
+from sqlalchemy.orm import Session, aliased
+from datetime import date, datetime, timedelta
+from functools import lru_cache
 from typing import List, Optional
 from contextlib import asynccontextmanager
+import orjson
 import threading
 import time
 
-from config import API_HOST, API_PORT
-from database import init_db, get_db, SessionLocal, SensorReadingDB, AlertEventDB
+from config import (
+    API_HOST, API_PORT, DB_FLUSH_INTERVAL_SECONDS, DB_FLUSH_BATCH_SIZE,
+    DAILY_SUMMARY_CACHE_SIZE, TIMELINE_STREAM_BATCH_SIZE
+)
+from database import init_db, get_db, SessionLocal, ScopedSession, SensorReadingDB, AlertEventDB
 from models import (
-    SensorReading, ProcessedReading, CurrentStatus, 
-    SessionStats, TimelineDataPoint, ActivityState
+    SensorReading, ProcessedReading, CurrentStatus, SedentaryAlert,
+    SessionStats, TimelineDataPoint, ActivityState, ACTIVITY_STATE_CODES, ACTIVITY_STATES_BY_CODE
 )
 from data_processor import DataProcessor
 from serial_reader import get_serial_reader, SerialReader
+from utils import to_utc, utcnow, now_berlin, berlin_day_bounds
 
 
 # Global instances
@@ -27,49 +35,117 @@ data_processor = DataProcessor()
 serial_reader: Optional[SerialReader] = None
 
 
-def process_and_store_reading(reading: SensorReading):
+# Buffered rows waiting to be written by the flush thread
+_pending_readings: List[dict] = []
+_pending_alerts: List[dict] = []
+_pending_lock = threading.Lock()
+_flush_wakeup = threading.Event()
+_flush_stop = threading.Event()
+_flush_thread: Optional[threading.Thread] = None
+
+# Core INSERT statements, executed as executemany over the buffered rows
+_INSERT_READING = insert(SensorReadingDB.__table__)
+_INSERT_ALERT = insert(AlertEventDB.__table__)
+
+
+def process_and_store_readings(readings: List[SensorReading]):
     """
-    Callback function to process and store each reading.
-    Called by the serial reader for each new reading.
+    Callback function to process and buffer a batch of readings.
+    Called by the serial reader once per chunk of parsed lines.
+    Rows are written to the database in batches by the flush thread.
     """
-    # Process the reading
-    processed = data_processor.process_reading(reading)
+    process_reading = data_processor.process_reading
+    rows = []
+    alerts = []
     
-    # Store in database
-    db = SessionLocal()
+    for reading in readings:
+        # Process the reading
+        processed = process_reading(reading)
+        
+        # Stored as UTC so read endpoints can return timestamps without conversion
+        timestamp = to_utc(processed.timestamp)
+        
+        rows.append({
+            "timestamp": timestamp,
+            "pir": processed.pir,
+            "delta_mag": processed.delta_mag,
+            "delta_mag_smoothed": processed.delta_mag_smoothed,
+            "inactive_seconds": processed.inactive_seconds,
+            "alerted": processed.alerted,
+            "activity_state": ACTIVITY_STATE_CODES[processed.activity_state],
+            "confidence": processed.confidence
+        })
+        
+        if processed.is_new_alert:
+            alerts.append({
+                "timestamp": timestamp,
+                "duration_seconds": processed.inactive_seconds
+            })
+    
+    with _pending_lock:
+        _pending_readings.extend(rows)
+        _pending_alerts.extend(alerts)
+        batch_full = len(_pending_readings) >= DB_FLUSH_BATCH_SIZE
+    
+    if batch_full:
+        _flush_wakeup.set()
+
+
+def flush_pending_readings():
+    """Write all buffered readings and alerts to the database in one transaction"""
+    global _pending_readings, _pending_alerts
+    
+    with _pending_lock:
+        readings, _pending_readings = _pending_readings, []
+        alerts, _pending_alerts = _pending_alerts, []
+    
+    if not readings and not alerts:
+        return
+    
+    # Reuse this thread's session instead of opening one per flush
+    db = ScopedSession()
     try:
-        db_reading = SensorReadingDB(
-            timestamp=processed.timestamp,
-            pir=processed.pir,
-            delta_mag=processed.delta_mag,
-            delta_mag_smoothed=processed.delta_mag_smoothed,
-            inactive_seconds=processed.inactive_seconds,
-            alerted=processed.alerted,
-            activity_state=processed.activity_state.value,
-            confidence=processed.confidence
-        )
-        db.add(db_reading)
+        db.execute(_INSERT_READING, readings)
         
-        # If this is an alert, store the alert event
-        if processed.alerted == 1:
-            # Check if we already have this alert (within last 5 seconds)
-            recent_alert = db.query(AlertEventDB).filter(
-                AlertEventDB.timestamp >= processed.timestamp - timedelta(seconds=5)
-            ).first()
-            
-            if not recent_alert:
-                alert_event = AlertEventDB(
-                    timestamp=processed.timestamp,
-                    duration_seconds=processed.inactive_seconds
-                )
-                db.add(alert_event)
+        if alerts:
+            db.execute(_INSERT_ALERT, alerts)
         
         db.commit()
     except Exception as e:
-        print(f"Error storing reading: {e}")
+        print(f"Error storing readings: {e}")
         db.rollback()
+
+
+def _flush_loop():
+    """Flush buffered readings periodically - runs in separate thread"""
+    try:
+        while not _flush_stop.is_set():
+            _flush_wakeup.wait(DB_FLUSH_INTERVAL_SECONDS)
+            _flush_wakeup.clear()
+            flush_pending_readings()
+        
+        # Write anything buffered after the last flush
+        flush_pending_readings()
     finally:
-        db.close()
+        ScopedSession.remove()
+
+
+def start_flush_thread():
+    """Start the background flush thread"""
+    global _flush_thread
+    
+    _flush_stop.clear()
+    _flush_thread = threading.Thread(target=_flush_loop, daemon=True)
+    _flush_thread.start()
+
+
+def stop_flush_thread():
+    """Stop the flush thread - it writes any remaining readings before exiting"""
+    _flush_stop.set()
+    _flush_wakeup.set()
+    
+    if _flush_thread:
+        _flush_thread.join(timeout=5)
 
 
 @asynccontextmanager
@@ -80,10 +156,11 @@ async def lifespan(app: FastAPI):
     # Startup
     print("Starting Sedentary Activity Tracker Backend...")
     init_db()
+    start_flush_thread()
     
     # Initialize serial reader
     serial_reader = get_serial_reader()
-    serial_reader.set_callback(process_and_store_reading)
+    serial_reader.set_batch_callback(process_and_store_readings)
     
     # Try to connect to serial port
     if serial_reader.connect():
@@ -98,6 +175,7 @@ async def lifespan(app: FastAPI):
     print("Shutting down...")
     if serial_reader:
         serial_reader.stop_reading()
+    stop_flush_thread()
 
 
 # Create FastAPI app
@@ -150,60 +228,71 @@ def get_session_stats():
 
 
 @app.get("/api/readings/recent", response_model=List[ProcessedReading])
-from utils import to_berlin
-
 def get_recent_readings(limit: int = 50, db: Session = Depends(get_db)):
     """
     Get recent sensor readings.
     Returns the most recent processed readings from the database.
     """
-    readings = db.query(SensorReadingDB).order_by(
+    # Select the newest rows, then let the database return them oldest first
+    newest = db.query(SensorReadingDB).order_by(
         SensorReadingDB.timestamp.desc()
-    ).limit(limit).all()
+    ).limit(limit).subquery()
+    recent = aliased(SensorReadingDB, newest)
     
-    return [
-        ProcessedReading(
-            id=r.id,
-            timestamp=to_berlin(r.timestamp),
-            pir=r.pir,
-            delta_mag=r.delta_mag,
-            delta_mag_smoothed=r.delta_mag_smoothed,
-            inactive_seconds=r.inactive_seconds,
-            alerted=r.alerted,
-            activity_state=ActivityState(r.activity_state),
-            confidence=r.confidence
+    return db.query(recent).order_by(recent.timestamp.asc()).all()
+
+
+def _stream_timeline(since: datetime):
+    """
+    Yield the timeline as a JSON array, one chunk per batch of rows.
+    Uses its own session because it runs after the endpoint has returned.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            select(
+                SensorReadingDB.timestamp,
+                SensorReadingDB.activity_state,
+                SensorReadingDB.delta_mag,
+                SensorReadingDB.inactive_seconds
+            )
+            .where(SensorReadingDB.timestamp >= since)
+            .order_by(SensorReadingDB.timestamp.asc())
+            .execution_options(yield_per=TIMELINE_STREAM_BATCH_SIZE)
         )
-        for r in reversed(readings)  # Return in chronological order
-    ]
+        
+        yield b"["
+        separator = b""
+        for rows in result.partitions():
+            chunk = b",".join(
+                orjson.dumps({
+                    "timestamp": timestamp,
+                    "activity_state": ACTIVITY_STATES_BY_CODE[state_code],
+                    "delta_mag": delta_mag,
+                    "inactive_seconds": inactive_seconds
+                }, option=orjson.OPT_UTC_Z)
+                for timestamp, state_code, delta_mag, inactive_seconds in rows
+            )
+            yield separator + chunk
+            separator = b","
+        yield b"]"
+    finally:
+        db.close()
 
 
 @app.get("/api/timeline", response_model=List[TimelineDataPoint])
-def get_timeline_data(
-    minutes: int = 60,
-    db: Session = Depends(get_db)
-):
+def get_timeline_data(minutes: int = 60):
     """
     Get timeline data for visualization.
     Returns activity states over time for the specified number of minutes.
+    The response is streamed so large ranges are never held in memory at once.
     """
-    since = datetime.now() - timedelta(minutes=minutes)
-    
-    readings = db.query(SensorReadingDB).filter(
-        SensorReadingDB.timestamp >= since
-    ).order_by(SensorReadingDB.timestamp.asc()).all()
+    since = utcnow() - timedelta(minutes=minutes)
     
-    return [
-        TimelineDataPoint(
-            timestamp=to_berlin(r.timestamp),
-            activity_state=ActivityState(r.activity_state),
-            delta_mag=r.delta_mag,
-            inactive_seconds=r.inactive_seconds
-        )
-        for r in readings
-    ]
+    return StreamingResponse(_stream_timeline(since), media_type="application/json")
 
 
-@app.get("/api/alerts", response_model=List[dict])
+@app.get("/api/alerts", response_model=List[SedentaryAlert])
 def get_alert_events(
     limit: int = 20,
     db: Session = Depends(get_db)
@@ -211,48 +300,31 @@ def get_alert_events(
     """
     Get recent sedentary alert events.
     """
-    alerts = db.query(AlertEventDB).order_by(
+    return db.query(AlertEventDB).order_by(
         AlertEventDB.timestamp.desc()
     ).limit(limit).all()
-    
-    return [
-        {
-            "id": a.id,
-            "timestamp": to_berlin(a.timestamp),
-            "duration_seconds": a.duration_seconds
-        }
-        for a in alerts
-    ]
 
 
-@app.get("/api/daily-summary")
-def get_daily_summary(
-    date: Optional[str] = None,
-    db: Session = Depends(get_db)
-):
-    """
-    Get daily summary statistics.
-    If no date provided, returns today's summary.
-    """
-    if date:
-        target_date = datetime.strptime(date, "%Y-%m-%d").date()
-    else:
-        target_date = datetime.now().date()
+def compute_daily_summary(db: Session, target_date: date) -> dict:
+    """Aggregate readings and alerts for one day"""
+    start_of_day, end_of_day = berlin_day_bounds(target_date)
     
-    start_of_day = datetime.combine(target_date, datetime.min.time())
-    end_of_day = datetime.combine(target_date, datetime.max.time())
-    
-    readings = db.query(SensorReadingDB).filter(
+    # Aggregate in the database instead of loading every row of the day
+    total, active_count, max_inactive = db.query(
+        func.count(SensorReadingDB.id),
+        func.sum(case((SensorReadingDB.activity_state == ACTIVITY_STATE_CODES[ActivityState.ACTIVE], 1), else_=0)),
+        func.max(SensorReadingDB.inactive_seconds)
+    ).filter(
         SensorReadingDB.timestamp >= start_of_day,
-        SensorReadingDB.timestamp <= end_of_day
-    ).all()
+        SensorReadingDB.timestamp < end_of_day
+    ).one()
     
-    alerts = db.query(AlertEventDB).filter(
+    alert_count = db.query(func.count(AlertEventDB.id)).filter(
         AlertEventDB.timestamp >= start_of_day,
-        AlertEventDB.timestamp <= end_of_day
-    ).all()
+        AlertEventDB.timestamp < end_of_day
+    ).scalar()
     
-    if not readings:
+    if not total:
         return {
             "date": str(target_date),
             "total_readings": 0,
@@ -263,28 +335,59 @@ def get_daily_summary(
             "longest_inactive_period": 0
         }
     
-    active_count = sum(1 for r in readings if r.activity_state == "active")
-    inactive_count = sum(1 for r in readings if r.activity_state != "active")
-    max_inactive = max((r.inactive_seconds for r in readings), default=0)
-    
-    total = len(readings)
+    active_count = active_count or 0
     active_pct = (active_count / total * 100) if total > 0 else 0
     
     return {
         "date": str(target_date),
         "total_readings": total,
         "active_seconds": active_count,
-        "inactive_seconds": inactive_count,
+        "inactive_seconds": total - active_count,
         "active_percentage": round(active_pct, 2),
-        "alert_count": len(alerts),
-        "longest_inactive_period": max_inactive
+        "alert_count": alert_count,
+        "longest_inactive_period": max_inactive or 0
     }
 
 
+@lru_cache(maxsize=DAILY_SUMMARY_CACHE_SIZE)
+def _cached_daily_summary(target_date: date) -> dict:
+    """Daily summary for a settled past day - these no longer change, so they are cached"""
+    db = SessionLocal()
+    try:
+        return compute_daily_summary(db, target_date)
+    finally:
+        db.close()
+
+
+@app.get("/api/daily-summary")
+def get_daily_summary(
+    date: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Get daily summary statistics.
+    If no date provided, returns today's summary.
+    """
+    today = now_berlin().date()
+    
+    if date:
+        target_date = datetime.strptime(date, "%Y-%m-%d").date()
+    else:
+        target_date = today
+    
+    # Yesterday is not cached: rows are keyed by the Arduino clock and reach
+    # the database after a flush delay, so it can still fill in after midnight
+    if target_date < today - timedelta(days=1):
+        return _cached_daily_summary(target_date)
+    
+    return compute_daily_summary(db, target_date)
+
+
 @app.post("/api/reset-stats")
 def reset_session_stats():
     """Reset the current session statistics"""
     data_processor.reset_stats()
+    _cached_daily_summary.cache_clear()
     return {"message": "Session statistics reset successfully"}
 
 
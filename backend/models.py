@@ -2,9 +2,10 @@
 Data models for the Sedentary Activity Tracker
 """
 
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional
-from pydantic import BaseModel
+from typing import Optional, Annotated
+from pydantic import BaseModel, BeforeValidator, ConfigDict
 from enum import Enum
 
 
@@ -15,8 +16,33 @@ class ActivityState(str, Enum):
     TRANSITION = "transition"
 
 
-class SensorReading(BaseModel):
-    """Raw sensor reading from Arduino"""
+# activity_state is stored in the database as a small integer code
+ACTIVITY_STATE_CODES = {
+    ActivityState.ACTIVE: 0,
+    ActivityState.INACTIVE: 1,
+    ActivityState.TRANSITION: 2,
+}
+ACTIVITY_STATES_BY_CODE = {code: state for state, code in ACTIVITY_STATE_CODES.items()}
+
+
+def decode_activity_state(value):
+    """Accept either an ActivityState or the integer code stored in the database"""
+    if isinstance(value, int):
+        return ACTIVITY_STATES_BY_CODE[value]
+    return value
+
+
+# ActivityState that can be read directly from a database row
+StoredActivityState = Annotated[ActivityState, BeforeValidator(decode_activity_state)]
+
+
+@dataclass(slots=True)
+class SensorReading:
+    """
+    Raw sensor reading from Arduino.
+    One is created per serial line, and the parser already produces typed
+    values - a slotted dataclass skips Pydantic validation and __dict__.
+    """
     timestamp: datetime
     pir: int  # 0 or 1
     delta_mag: float  # Change in acceleration magnitude
@@ -26,6 +52,8 @@ class SensorReading(BaseModel):
 
 class ProcessedReading(BaseModel):
     """Processed sensor reading with activity classification"""
+    model_config = ConfigDict(from_attributes=True)
+
     id: Optional[int] = None
     timestamp: datetime
     pir: int
@@ -33,12 +61,31 @@ class ProcessedReading(BaseModel):
     delta_mag_smoothed: float
     inactive_seconds: int
     alerted: int
-    activity_state: ActivityState
+    activity_state: StoredActivityState
     confidence: float  # 0.0 to 1.0
 
 
+@dataclass(slots=True)
+class ClassifiedReading:
+    """
+    Classified reading on the ingest path.
+    Plain data carrier for the database writer - skips Pydantic validation.
+    """
+    timestamp: datetime
+    pir: int
+    delta_mag: float
+    delta_mag_smoothed: float
+    inactive_seconds: int
+    alerted: int
+    activity_state: ActivityState
+    confidence: float
+    is_new_alert: bool  # First reading of a new alert event
+
+
 class SedentaryAlert(BaseModel):
     """Sedentary alert event"""
+    model_config = ConfigDict(from_attributes=True)
+
     id: Optional[int] = None
     timestamp: datetime
     duration_seconds: int  # How long they were inactive when alert triggered
@@ -65,7 +112,9 @@ class SessionStats(BaseModel):
 
 class TimelineDataPoint(BaseModel):
     """Data point for timeline visualization"""
+    model_config = ConfigDict(from_attributes=True)
+
     timestamp: datetime
-    activity_state: ActivityState
+    activity_state: StoredActivityState
     delta_mag: float
     inactive_seconds: int
@@ -2,21 +2,68 @@
 Serial port reader for live Arduino data
 """
 
+import numpy as np
+import re
 import serial
 import threading
 import time
+from collections import deque
 from datetime import datetime
+from functools import lru_cache
 from typing import Optional, Callable, List
-from queue import Queue
 
-from config import SERIAL_PORT, BAUD_RATE
+from config import (
+    SERIAL_PORT, BAUD_RATE, SERIAL_READ_TIMEOUT,
+    SERIAL_ERROR_BACKOFF_MIN, SERIAL_ERROR_BACKOFF_MAX, SERIAL_BATCH_PARSE_MIN_LINES
+)
 from models import SensorReading
+from utils import ReadingRingBuffer
+
+# Startup and separator lines printed by the Arduino sketch
+_SKIP_PREFIXES = (b"Sedentary", b"CSV", b"-")
+
+# A well-formed data line exactly as the sketch prints it. One C-level match
+# classifies and splits it; header and alert lines can never match.
+_DATA_RE = re.compile(
+    rb"(\d{4})-(\d\d)-(\d\d) (\d\d):(\d\d):(\d\d),(\d+),([-+\d.eE]+),(\d+),(\d+)\s*\Z"
+)
+
+# Column layout of a data line for vectorized batch parsing
+_BATCH_DTYPE = np.dtype([
+    ("timestamp", "datetime64[s]"),
+    ("pir", np.int8),
+    ("delta_mag", np.float64),  # float64 so values round-trip exactly to Python floats
+    ("inactive_seconds", np.int32),
+    ("alerted", np.int8),
+])
+
+
+def _is_skipped_line(line: bytes) -> bool:
+    """Header lines, separators and alert messages carry no reading"""
+    return line.startswith(_SKIP_PREFIXES) or b"SEDENTARY ALERT" in line or b"inactive for" in line
+
+
+def _parse_timestamp(ts: bytes) -> datetime:
+    """
+    Parse an Arduino timestamp (YYYY-MM-DD HH:MM:SS).
+    The RTC always sends this fixed-width format, so the fields are sliced
+    straight from the bytes instead of decoding and calling the much slower
+    strptime.
+    """
+    if len(ts) != 19:
+        return datetime.strptime(ts.decode('utf-8', errors='ignore'), "%Y-%m-%d %H:%M:%S")
+    
+    return datetime(
+        int(ts[0:4]), int(ts[5:7]), int(ts[8:10]),
+        int(ts[11:13]), int(ts[14:16]), int(ts[17:19])
+    )
 
 
 class SerialReader:
     """
     Reads CSV data from Arduino via serial port.
-    Runs in a separate thread to avoid blocking the main application.
+    Serial I/O and parsing run in separate background threads so neither
+    blocks the other or the main application.
     """
 
     def __init__(self, port: str = SERIAL_PORT, baud_rate: int = BAUD_RATE):
@@ -25,16 +72,35 @@ class SerialReader:
         self.serial_connection: Optional[serial.Serial] = None
         self.is_running = False
         self.read_thread: Optional[threading.Thread] = None
+        self.parse_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
         
-        # Queue for thread-safe data transfer
-        self.data_queue: Queue = Queue()
+        # Byte ring between the I/O thread (sole writer of _ring_tail) and
+        # the parser thread (sole writer of _ring_head). Both counters only
+        # grow, so with one producer and one consumer no lock is needed.
+        self.ring_buffer_size = 65536
+        self._ring = bytearray(self.ring_buffer_size)
+        self._ring_head = 0
+        self._ring_tail = 0
+        self._data_ready = threading.Event()
+        self._space_ready = threading.Event()
         
-        # Callback for real-time processing
+        # Queue for data transfer - deque append/popleft are thread-safe,
+        # and with a single producer and consumer no lock is needed.
+        # Bounded so the oldest readings are dropped if nobody drains it.
+        self.max_pending_readings = 1000
+        self.data_queue: deque = deque(maxlen=self.max_pending_readings)
+        
+        # Bytes received but not yet terminated by a newline
+        self._line_buffer = bytearray()
+        
+        # Callbacks for real-time processing - per reading and per parsed chunk
         self.on_reading_callback: Optional[Callable[[SensorReading], None]] = None
+        self.on_batch_callback: Optional[Callable[[List[SensorReading]], None]] = None
         
         # Buffer for recent readings
-        self.recent_readings: List[SensorReading] = []
         self.max_recent_readings = 100
+        self.recent_readings = ReadingRingBuffer(self.max_recent_readings)
 
     def connect(self) -> bool:
         """
@@ -45,15 +111,24 @@ class SerialReader:
             self.serial_connection = serial.Serial(
                 port=self.port,
                 baudrate=self.baud_rate,
-                timeout=1
+                timeout=SERIAL_READ_TIMEOUT
             )
             print(f"Connected to {self.port} at {self.baud_rate} baud")
             
+            # Ask the driver to deliver bytes immediately instead of batching
+            # them (ASYNC_LOW_LATENCY). Only available on Linux - optional.
+            try:
+                self.serial_connection.set_low_latency_mode(True)
+            except (AttributeError, NotImplementedError, ValueError, OSError):
+                pass
+            
             # Wait for Arduino to reset after connection
             time.sleep(2)
             
             # Clear any startup messages
             self.serial_connection.flushInput()
+            self._ring_head = self._ring_tail = 0
+            self._line_buffer.clear()
             
             return True
             
@@ -67,34 +142,52 @@ class SerialReader:
             self.serial_connection.close()
             print(f"Disconnected from {self.port}")
 
-    def parse_csv_line(self, line: str) -> Optional[SensorReading]:
+    def parse_csv_line(self, line: bytes) -> Optional[SensorReading]:
         """
-        Parse a CSV line from Arduino.
+        Parse a raw CSV line from Arduino.
         Expected format: timestamp,pir,deltaMag,inactiveSeconds,alerted
         Example: 2025-12-31 14:30:15,1,0.234,5,0
         """
         try:
-            # Skip header lines or non-data lines
-            if line.startswith("Sedentary") or line.startswith("CSV") or line.startswith("-"):
-                return None
+            # Fast path for the canonical format
+            match = _DATA_RE.match(line)
+            if match:
+                year, month, day, hour, minute, second, pir, delta_mag, inactive_seconds, alerted = match.groups()
+                return SensorReading(
+                    timestamp=datetime(
+                        int(year), int(month), int(day),
+                        int(hour), int(minute), int(second)
+                    ),
+                    pir=int(pir),
+                    delta_mag=float(delta_mag),
+                    inactive_seconds=int(inactive_seconds),
+                    alerted=int(alerted)
+                )
             
-            # Skip alert messages
-            if "SEDENTARY ALERT" in line or "inactive for" in line:
+            # Anything else goes through the lenient path below.
+            # Skip header lines, separators and alert messages
+            if _is_skipped_line(line):
                 return None
             
-            parts = line.strip().split(",")
+            # Locate the four commas in place instead of strip() + split(),
+            # so no intermediate strings are built for the numeric fields
+            c1 = line.find(b",")
+            c2 = line.find(b",", c1 + 1)
+            c3 = line.find(b",", c2 + 1)
+            c4 = line.find(b",", c3 + 1)
             
-            if len(parts) != 5:
+            if c2 < 0 or c3 < 0 or c4 < 0 or line.find(b",", c4 + 1) >= 0:
                 return None
             
             # Parse timestamp
-            timestamp = datetime.strptime(parts[0], "%Y-%m-%d %H:%M:%S")
+            timestamp = _parse_timestamp(line[:c1].strip())
             
-            # Parse sensor values
-            pir = int(parts[1])
-            delta_mag = float(parts[2])
-            inactive_seconds = int(parts[3])
-            alerted = int(parts[4])
+            # Parse sensor values - int() and float() accept bytes and
+            # ignore surrounding whitespace such as the trailing \r\n
+            pir = int(line[c1 + 1:c2])
+            delta_mag = float(line[c2 + 1:c3])
+            inactive_seconds = int(line[c3 + 1:c4])
+            alerted = int(line[c4 + 1:])
             
             return SensorReading(
                 timestamp=timestamp,
@@ -108,44 +201,161 @@ class SerialReader:
             # Invalid line format - skip it
             return None
 
+    def parse_batch(self, chunk: bytes) -> List[SensorReading]:
+        """
+        Parse a chunk of complete CSV lines in one vectorized numpy pass.
+        If any candidate line is malformed or has a non-standard timestamp,
+        the chunk falls back to parse_csv_line so only the bad lines are dropped.
+        """
+        lines = [
+            line for line in (raw.strip() for raw in chunk.splitlines())
+            if line.count(b",") == 4 and not _is_skipped_line(line)
+        ]
+        if not lines:
+            return []
+        
+        # numpy only handles the fixed-width RTC timestamp; anything else
+        # needs the strptime fallback in parse_csv_line
+        rows = None
+        if all(line.find(b",") == 19 for line in lines):
+            try:
+                rows = np.loadtxt(lines, dtype=_BATCH_DTYPE, delimiter=",", ndmin=1)
+            except ValueError:
+                pass
+        
+        if rows is None:
+            readings = []
+            for line in lines:
+                reading = self.parse_csv_line(line)
+                if reading:
+                    readings.append(reading)
+            return readings
+        
+        return [
+            SensorReading(
+                timestamp=timestamp,
+                pir=pir,
+                delta_mag=delta_mag,
+                inactive_seconds=inactive_seconds,
+                alerted=alerted
+            )
+            for timestamp, pir, delta_mag, inactive_seconds, alerted in zip(
+                rows["timestamp"].tolist(),
+                rows["pir"].tolist(),
+                rows["delta_mag"].tolist(),
+                rows["inactive_seconds"].tolist(),
+                rows["alerted"].tolist()
+            )
+        ]
+
     def _read_loop(self):
-        """Main reading loop - runs in separate thread"""
+        """I/O loop - copies serial bytes into the ring, runs in separate thread"""
         print("Serial reading started...")
         
+        ring = memoryview(self._ring)
+        size = len(self._ring)
+        backoff = SERIAL_ERROR_BACKOFF_MIN
+        
         while self.is_running:
             try:
-                if self.serial_connection and self.serial_connection.in_waiting > 0:
-                    # Read line from serial
-                    line = self.serial_connection.readline().decode('utf-8', errors='ignore')
-                    
-                    # Parse the CSV data
-                    reading = self.parse_csv_line(line)
-                    
-                    if reading:
-                        # Add to queue for main thread
-                        self.data_queue.put(reading)
-                        
-                        # Store in recent readings buffer
-                        self.recent_readings.append(reading)
-                        if len(self.recent_readings) > self.max_recent_readings:
-                            self.recent_readings.pop(0)
-                        
-                        # Call callback if registered
-                        if self.on_reading_callback:
-                            self.on_reading_callback(reading)
+                free = size - (self._ring_tail - self._ring_head)
+                if not free:
+                    # Parser is behind - the OS buffer holds new bytes meanwhile
+                    self._space_ready.wait(SERIAL_READ_TIMEOUT)
+                    self._space_ready.clear()
+                    continue
                 
-                else:
-                    # Small delay to prevent busy waiting
-                    time.sleep(0.05)
-                    
+                # Block in the driver until data arrives (or the read timeout
+                # expires), then take whatever else is already waiting, up to
+                # the free space before the end of the ring
+                start = self._ring_tail % size
+                want = min(self.serial_connection.in_waiting or 1, free, size - start)
+                n = self.serial_connection.readinto(ring[start:start + want])
+                
+                if n:
+                    self._ring_tail += n
+                    self._data_ready.set()
+                backoff = SERIAL_ERROR_BACKOFF_MIN
+            
             except Exception as e:
                 print(f"Error reading from serial: {e}")
-                time.sleep(0.5)
+                # Retry quickly after a transient error, back off if it persists.
+                # stop_reading() sets the event, which ends the wait at once.
+                if self._stop_event.wait(backoff):
+                    break
+                backoff = min(backoff * 2, SERIAL_ERROR_BACKOFF_MAX)
         
         print("Serial reading stopped.")
 
+    def _parse_loop(self):
+        """Parser loop - consumes the ring and parses lines, runs in separate thread"""
+        ring = memoryview(self._ring)
+        size = len(self._ring)
+        
+        # Bind hot-loop attributes to locals once
+        line_buffer = self._line_buffer
+        data_ready = self._data_ready
+        space_ready = self._space_ready
+        queue_extend = self.data_queue.extend
+        recent_append = self.recent_readings.append
+        parse_line = self.parse_csv_line
+        parse_batch = self.parse_batch
+        
+        while self.is_running:
+            if not data_ready.wait(SERIAL_READ_TIMEOUT):
+                continue
+            # Clear before reading the tail so a later write always sets it again
+            data_ready.clear()
+            
+            try:
+                head = self._ring_head
+                tail = self._ring_tail
+                start = head % size
+                first = min(tail - head, size - start)
+                line_buffer += ring[start:start + first]
+                line_buffer += ring[:tail - head - first]
+                self._ring_head = tail
+                space_ready.set()
+                
+                # Keep the trailing partial line for the next read
+                end = line_buffer.rfind(b"\n") + 1
+                if not end:
+                    continue
+                chunk = bytes(line_buffer[:end])
+                del line_buffer[:end]
+                
+                # Parse the CSV data - numpy's per-call overhead only pays off
+                # once a backlog of lines arrives in one read
+                if chunk.count(b"\n") < SERIAL_BATCH_PARSE_MIN_LINES:
+                    readings = [reading for reading in map(parse_line, chunk.splitlines()) if reading]
+                else:
+                    readings = parse_batch(chunk)
+                
+                if not readings:
+                    continue
+                
+                # Add to queue for main thread
+                queue_extend(readings)
+                
+                # Store in recent readings buffer
+                for reading in readings:
+                    recent_append(reading)
+                
+                # Call callbacks if registered - the batch callback once per chunk
+                on_reading = self.on_reading_callback
+                if on_reading:
+                    for reading in readings:
+                        on_reading(reading)
+                
+                on_batch = self.on_batch_callback
+                if on_batch:
+                    on_batch(readings)
+            
+            except Exception as e:
+                print(f"Error processing serial data: {e}")
+
     def start_reading(self):
-        """Start the background reading thread"""
+        """Start the background I/O and parser threads"""
         if self.is_running:
             print("Already reading")
             return
@@ -156,45 +366,54 @@ class SerialReader:
                 return
         
         self.is_running = True
+        self._stop_event.clear()
+        self.parse_thread = threading.Thread(target=self._parse_loop, daemon=True)
+        self.parse_thread.start()
         self.read_thread = threading.Thread(target=self._read_loop, daemon=True)
         self.read_thread.start()
         print("Background reading thread started")
 
     def stop_reading(self):
-        """Stop the background reading thread"""
+        """Stop the background I/O and parser threads"""
         self.is_running = False
         
+        # Wake both threads from any wait so they see the stop immediately
+        self._stop_event.set()
+        self._data_ready.set()
+        self._space_ready.set()
+        
         if self.read_thread:
             self.read_thread.join(timeout=2)
+        if self.parse_thread:
+            self.parse_thread.join(timeout=2)
         
         self.disconnect()
 
     def get_pending_readings(self) -> List[SensorReading]:
         """Get all pending readings from the queue"""
         readings = []
-        while not self.data_queue.empty():
-            readings.append(self.data_queue.get())
+        # popleft until empty, so readings appended meanwhile are never lost
+        while self.data_queue:
+            readings.append(self.data_queue.popleft())
         return readings
 
     def get_recent_readings(self, count: int = 50) -> List[SensorReading]:
         """Get the most recent readings"""
-        return self.recent_readings[-count:]
+        return self.recent_readings.latest(count)
 
     def set_callback(self, callback: Callable[[SensorReading], None]):
         """Set callback function to be called for each new reading"""
         self.on_reading_callback = callback
 
-
-# Singleton instance for global access
-_serial_reader: Optional[SerialReader] = None
+    def set_batch_callback(self, callback: Callable[[List[SensorReading]], None]):
+        """Set callback function to be called once with each chunk of new readings"""
+        self.on_batch_callback = callback
 
 
+@lru_cache(maxsize=1)
 def get_serial_reader() -> SerialReader:
     """Get or create the global serial reader instance"""
-    global _serial_reader
-    if _serial_reader is None:
-        _serial_reader = SerialReader()
-    return _serial_reader
+    return SerialReader()
 
 
 if __name__ == "__main__":
@@ -212,8 +431,10 @@ if __name__ == "__main__":
         
         try:
             print("Reading from serial port. Press Ctrl+C to stop...")
-            while True:
-                time.sleep(1)
+            # Block on the reader thread itself. The timeout only keeps Ctrl+C
+            # responsive on Windows, where an untimed join can't be interrupted.
+            while reader.read_thread.is_alive():
+                reader.read_thread.join(timeout=1)
         except KeyboardInterrupt:
             print("\nStopping...")
         finally:
@@ -1,7 +1,12 @@
-from datetime import datetime
-import pytz
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Tuple
+from zoneinfo import ZoneInfo
+import numpy as np
 
-BERLIN_TZ = pytz.timezone('Europe/Berlin')
+from models import SensorReading
+
+BERLIN_TZ = ZoneInfo('Europe/Berlin')
+_UTC = timezone.utc
 
 def to_berlin(dt: datetime) -> datetime:
     """Convert a naive or UTC datetime to Berlin timezone-aware datetime.
@@ -9,10 +14,108 @@ def to_berlin(dt: datetime) -> datetime:
     """
     if dt.tzinfo is None:
         # Treat naive datetime as Berlin local time
-        return BERLIN_TZ.localize(dt)
+        return dt.replace(tzinfo=BERLIN_TZ)
     return dt.astimezone(BERLIN_TZ)
 
 
 def now_berlin() -> datetime:
     """Get current time in Berlin timezone."""
-    return datetime.now(pytz.UTC).astimezone(BERLIN_TZ)
+    return datetime.now(BERLIN_TZ)
+
+
+def to_utc(dt: datetime) -> datetime:
+    """Convert a datetime to a UTC timezone-aware datetime.
+    If naive, assume it's Berlin local time (as sent by the Arduino RTC).
+    """
+    return to_berlin(dt).astimezone(_UTC)
+
+
+def utcnow() -> datetime:
+    """Get current time as a UTC timezone-aware datetime."""
+    return datetime.now(_UTC)
+
+
+def berlin_day_bounds(day: date) -> Tuple[datetime, datetime]:
+    """Get the UTC start of a Berlin calendar day and the start of the next one.
+    Use as a half-open range: start <= timestamp < end.
+    """
+    start = to_utc(datetime.combine(day, datetime.min.time()))
+    end = to_utc(datetime.combine(day + timedelta(days=1), datetime.min.time()))
+    return start, end
+
+
+class ReadingRingBuffer:
+    """
+    Fixed-size buffer of the most recent sensor readings.
+    Stores each field in its own NumPy array (structure of arrays) instead
+    of keeping a list of SensorReading objects, so appends never allocate
+    and column-wise analysis can run on contiguous arrays.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.timestamps = np.empty(capacity, dtype="datetime64[us]")
+        self.pir = np.empty(capacity, dtype=np.int8)
+        self.delta_mag = np.empty(capacity, dtype=np.float64)
+        self.inactive_seconds = np.empty(capacity, dtype=np.int32)
+        self.alerted = np.empty(capacity, dtype=np.int8)
+        self.head = 0  # Next slot to write
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def append(self, reading: SensorReading):
+        """Store a reading, overwriting the oldest one when full"""
+        i = self.head
+        self.timestamps[i] = reading.timestamp
+        self.pir[i] = reading.pir
+        self.delta_mag[i] = reading.delta_mag
+        self.inactive_seconds[i] = reading.inactive_seconds
+        self.alerted[i] = reading.alerted
+        self.head = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def latest_indices(self, count: int) -> np.ndarray:
+        """Slot indices of the most recent readings, oldest first"""
+        count = max(0, min(count, self.count))
+        start = self.head - count
+        return np.arange(start, start + count) % self.capacity
+
+    def __getitem__(self, index: int) -> SensorReading:
+        """Rebuild a single reading; index 0 is the oldest, -1 the newest"""
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("reading index out of range")
+        
+        i = (self.head - self.count + index) % self.capacity
+        return SensorReading(
+            timestamp=self.timestamps[i].item(),
+            pir=int(self.pir[i]),
+            delta_mag=float(self.delta_mag[i]),
+            inactive_seconds=int(self.inactive_seconds[i]),
+            alerted=int(self.alerted[i])
+        )
+
+    def latest(self, count: int) -> List[SensorReading]:
+        """Rebuild the most recent readings as SensorReading objects, oldest first"""
+        # Gather each column once and convert it in bulk instead of
+        # boxing every field of every slot individually
+        idx = self.latest_indices(count)
+        return [
+            SensorReading(
+                timestamp=timestamp,
+                pir=pir,
+                delta_mag=delta_mag,
+                inactive_seconds=inactive_seconds,
+                alerted=alerted
+            )
+            for timestamp, pir, delta_mag, inactive_seconds, alerted in zip(
+                self.timestamps[idx].tolist(),
+                self.pir[idx].tolist(),
+                self.delta_mag[idx].tolist(),
+                self.inactive_seconds[idx].tolist(),
+                self.alerted[idx].tolist()
+            )
+        ]